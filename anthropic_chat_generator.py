@@ -2,10 +2,40 @@
 
 import os
 import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
+from diskcache import Cache
 from haystack import component
 from haystack.dataclasses import ChatMessage
-from anthropic import Anthropic
+from anthropic import DEFAULT_CONNECTION_LIMITS, Anthropic, DefaultHttpxClient
+
+# orjson parses several times faster than the standard library; its JSONDecodeError subclasses json.JSONDecodeError
+from orjson import loads as _json_loads
+
+# One connection pool shared by every generator, so TLS/TCP handshakes are reused across calls.
+# Limits are built from the SDK's own Limits class, since newer SDK versions use httpx2 rather than httpx
+_HTTP_CLIENT = DefaultHttpxClient(
+    limits=type(DEFAULT_CONNECTION_LIMITS)(max_keepalive_connections=20, max_connections=50), timeout=60
+)
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _block_text(block) -> str:
+    """
+    Return the text of a single response content block.
+
+    :param block: A TextBlock object, a dict with a "text" key, or any other block.
+    :return: The block's text, or its string representation if it has none.
+    """
+    text = getattr(block, "text", None)
+    if text is not None:
+        return text
+    if isinstance(block, dict) and "text" in block:
+        return block["text"]
+    return str(block)
 
 
 @component
@@ -14,80 +44,167 @@ class AnthropicChatGenerator:
     A chat generator component that uses Anthropic's Claude API.
     """
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-5-sonnet-20241022", json_mode: bool = False):
+    # Response cache shared by every instance, created on first use
+    _cache: Optional[Cache] = None
+    cache_dir = ".llm_cache"
+    cache_expire = 86400
+
+    # Roughly 1024 tokens, the minimum prompt prefix length Anthropic will cache
+    prompt_cache_min_chars = 4096
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "claude-3-5-sonnet-20241022",
+        json_mode: bool = False,
+        batch_poll_interval: float = 20.0,
+        use_batch_api: bool = True,
+        max_workers: int = 10,
+        use_cache: bool = True,
+        prompt_caching: bool = False,
+    ):
         """
         Initialize the Anthropic Chat Generator.
 
         :param api_key: Anthropic API key. If not provided, will try to get from ANTHROPIC_API_KEY env var.
         :param model: The model to use (e.g., "claude-3-5-sonnet-20241022", "claude-sonnet-4-5-20250929")
         :param json_mode: If True, requests JSON-formatted responses. Default is False for plain text.
+        :param batch_poll_interval: Seconds to wait between status checks when using `run_batch`.
+        :param use_batch_api: If True, `run_batch` uses the Message Batches API. Otherwise it sends
+            individual requests concurrently from a thread pool.
+        :param max_workers: Maximum number of concurrent requests when `use_batch_api` is False.
+        :param use_cache: If True, identical requests are answered from an on-disk cache instead of calling the API.
+        :param prompt_caching: If True, the last long user message before the final one is marked for Anthropic
+            prompt caching. Cache writes cost more than regular input tokens, so only enable this when the same
+            prefix is sent again within the cache lifetime.
         """
         api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY environment variable or pass api_key parameter.")
         
-        self.client = Anthropic(api_key=api_key)
+        self.client = Anthropic(api_key=api_key, http_client=_HTTP_CLIENT)
         self.model = model
         self.json_mode = json_mode
+        self.batch_poll_interval = batch_poll_interval
+        self.use_batch_api = use_batch_api
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.prompt_caching = prompt_caching
 
-    @component.output_types(replies=List[ChatMessage])
-    def run(self, messages: List[ChatMessage]):
+    @classmethod
+    def _get_cache(cls) -> Cache:
         """
-        Generate a reply using Anthropic's Claude API.
+        Return the shared on-disk response cache, opening it on first use.
+        """
+        if cls._cache is None:
+            cls._cache = Cache(cls.cache_dir)
+        return cls._cache
+
+    def _cache_key(self, api_params: dict) -> str:
+        """
+        Hash the exact API request, so only identical requests share a cached reply.
+
+        :param api_params: Keyword arguments for `messages.create`.
+        :return: Hex digest identifying the request.
+        """
+        payload = json.dumps({**api_params, "json_mode": self.json_mode}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _add_user_message(self, msg: ChatMessage, is_last: bool, request: dict):
+        """
+        Append a user message to the request as a text block.
+        """
+        content = msg.text
+        # If json_mode is enabled, add JSON instruction to the last user message
+        if self.json_mode and is_last:
+            content = msg.text + "\n\nIMPORTANT: You must respond with valid JSON only. Do not include any text outside of the JSON structure."
+        block = {"type": "text", "text": content}
+        # Remember the latest long leading user message (e.g. retrieved context) as the prompt cache breakpoint
+        if not is_last and len(content) >= self.prompt_cache_min_chars:
+            request["cache_block"] = block
+        # Consecutive user messages are sent as text blocks of a single user turn
+        anthropic_messages = request["messages"]
+        if anthropic_messages and anthropic_messages[-1]["role"] == "user":
+            anthropic_messages[-1]["content"].append(block)
+        else:
+            anthropic_messages.append({"role": "user", "content": [block]})
+
+    def _add_assistant_message(self, msg: ChatMessage, is_last: bool, request: dict):
+        """
+        Append an assistant message to the request.
+        """
+        request["messages"].append({"role": "assistant", "content": msg.text})
+
+    def _set_system_message(self, msg: ChatMessage, is_last: bool, request: dict):
+        """
+        Store the system message separately, as the Anthropic API expects.
+        """
+        system_message = msg.text
+        if self.json_mode:
+            system_message = (system_message or "") + "\n\nYou must always respond with valid JSON format only."
+        request["system"] = system_message
+
+    # Message handlers by ChatMessage role; messages with other roles are skipped
+    _ROLE_HANDLERS = {
+        "user": _add_user_message,
+        "assistant": _add_assistant_message,
+        "system": _set_system_message,
+    }
+
+    def _build_api_params(self, messages: List[ChatMessage]) -> dict:
+        """
+        Convert Haystack ChatMessages into the parameters of an Anthropic Messages API request.
 
         :param messages: List of ChatMessage objects representing the conversation.
-        :return: Dictionary with "replies" key containing a list of ChatMessage objects.
+        :return: Dictionary of keyword arguments for `messages.create`.
         """
-        # Convert Haystack ChatMessage to Anthropic format
-        anthropic_messages = []
-        system_message = None
-        
-        for msg in messages:
-            if msg.is_from("user"):
-                content = msg.text
-                # If json_mode is enabled, add JSON instruction to the last user message
-                if self.json_mode and msg == messages[-1]:
-                    content = msg.text + "\n\nIMPORTANT: You must respond with valid JSON only. Do not include any text outside of the JSON structure."
-                anthropic_messages.append({"role": "user", "content": content})
-            elif msg.is_from("assistant"):
-                anthropic_messages.append({"role": "assistant", "content": msg.text})
-            elif msg.is_from("system"):
-                # Store system message separately for Anthropic API
-                system_message = msg.text
-                if self.json_mode:
-                    system_message = (system_message or "") + "\n\nYou must always respond with valid JSON format only."
+        # Convert Haystack ChatMessage to Anthropic format, dispatching once on each message's role
+        request = {"messages": [], "system": None, "cache_block": None}
+
+        last_index = len(messages) - 1
+        for i, msg in enumerate(messages):
+            handler = self._ROLE_HANDLERS.get(msg.role.value)
+            if handler is not None:
+                handler(self, msg, i == last_index, request)
+
+        # A single breakpoint caches the whole prefix before it; the API allows at most four
+        if self.prompt_caching and request["cache_block"] is not None:
+            request["cache_block"]["cache_control"] = {"type": "ephemeral"}
 
         # Prepare API call parameters
         api_params = {
             "model": self.model,
             "max_tokens": 1024,
-            "messages": anthropic_messages
+            "messages": request["messages"]
         }
         
         # Add system message if present
-        if system_message:
-            api_params["system"] = system_message
+        if request["system"]:
+            api_params["system"] = request["system"]
         elif self.json_mode:
             # Add system instruction for JSON mode if no system message exists
             api_params["system"] = "You must always respond with valid JSON format only. Do not include any explanatory text outside the JSON structure."
 
-        # Call Anthropic API
-        response = self.client.messages.create(**api_params)
+        return api_params
+
+    def _extract_reply(self, response) -> str:
+        """
+        Extract the reply text from an Anthropic Message, cleaning it up in JSON mode.
 
+        :param response: Anthropic Message returned by the API.
+        :return: The reply text.
+        """
         # Extract the reply content
-        reply_content = ""
-        if response.content:
-            # Anthropic returns content as a list of TextBlock objects
-            for block in response.content:
-                if hasattr(block, 'text'):
-                    reply_content += block.text
-                elif isinstance(block, dict) and 'text' in block:
-                    reply_content += block['text']
-                elif hasattr(block, 'type') and block.type == 'text':
-                    reply_content += block.text
-                else:
-                    reply_content += str(block)
+        # Anthropic returns content as a list of TextBlock objects; join them in a single pass
+        return self._clean_reply("".join(_block_text(block) for block in response.content or []))
 
+    def _clean_reply(self, reply_content: str) -> str:
+        """
+        Clean up the reply text, extracting the JSON object from it in JSON mode.
+
+        :param reply_content: Raw reply text.
+        :return: The cleaned reply text.
+        """
         # If json_mode is enabled, validate and clean the JSON response
         if self.json_mode:
             # Try to extract JSON from the response (in case there's extra text)
@@ -95,23 +212,101 @@ class AnthropicChatGenerator:
             # Try to find JSON object in the response
             try:
                 # First, try parsing the entire response as JSON
-                json.loads(reply_content)
+                _json_loads(reply_content)
                 # If successful, keep it as is
             except json.JSONDecodeError:
-                # If not valid JSON, try to extract JSON from the text
-                # Look for JSON object boundaries
+                # If not valid JSON, decode the first JSON object in the text in a single pass
                 start_idx = reply_content.find('{')
-                end_idx = reply_content.rfind('}')
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    json_str = reply_content[start_idx:end_idx + 1]
+                if start_idx != -1:
                     try:
-                        json.loads(json_str)
-                        reply_content = json_str
+                        _, end_idx = _JSON_DECODER.raw_decode(reply_content, start_idx)
+                        reply_content = reply_content[start_idx:end_idx]
                     except json.JSONDecodeError:
                         pass  # Keep original if extraction fails
 
+        return reply_content
+
+    @component.output_types(replies=List[ChatMessage])
+    def run(self, messages: List[ChatMessage]):
+        """
+        Generate a reply using Anthropic's Claude API.
+
+        :param messages: List of ChatMessage objects representing the conversation.
+        :return: Dictionary with "replies" key containing a list of ChatMessage objects.
+        """
+        api_params = self._build_api_params(messages)
+
+        # Skip the API entirely if this exact request was answered before
+        if self.use_cache:
+            key = self._cache_key(api_params)
+            cached_content = self._get_cache().get(key)
+            if cached_content is not None:
+                return {"replies": [ChatMessage.from_assistant(cached_content)]}
+
+        # Call Anthropic API, streaming the reply text as it is generated
+        with self.client.messages.stream(**api_params) as stream:
+            reply_content = self._clean_reply("".join(stream.text_stream))
+
+        if self.use_cache:
+            self._get_cache().set(key, reply_content, expire=self.cache_expire)
+
         # Create a ChatMessage reply
         reply = ChatMessage.from_assistant(reply_content)
         
         return {"replies": [reply]}
 
+    def run_batch(self, messages_list: List[List[ChatMessage]]) -> List[Optional[ChatMessage]]:
+        """
+        Generate replies for many conversations at once.
+
+        With `use_batch_api` enabled, all requests are sent as one Message Batch and processed
+        concurrently server-side at half the token cost of individual calls. Otherwise they are sent
+        as individual requests from a thread pool of `max_workers` threads.
+        Either way this call blocks until every reply is available.
+
+        :param messages_list: List of conversations, each a list of ChatMessage objects.
+        :return: List of reply ChatMessages in the same order as `messages_list`.
+            Entries are None for batch requests that errored, were canceled or expired.
+        """
+        if not messages_list:
+            return []
+
+        if not self.use_batch_api:
+            # Cap concurrency to stay within the account's rate limits
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return [result["replies"][0] for result in executor.map(self.run, messages_list)]
+
+        replies: List[Optional[ChatMessage]] = [None] * len(messages_list)
+        all_params = [self._build_api_params(messages) for messages in messages_list]
+        keys = [self._cache_key(api_params) for api_params in all_params] if self.use_cache else []
+
+        # Submit one request per uncached conversation, using its position as the custom ID
+        requests = []
+        for i, api_params in enumerate(all_params):
+            cached_content = self._get_cache().get(keys[i]) if self.use_cache else None
+            if cached_content is not None:
+                replies[i] = ChatMessage.from_assistant(cached_content)
+            else:
+                requests.append({"custom_id": str(i), "params": api_params})
+
+        if not requests:
+            return replies
+
+        batch = self.client.messages.batches.create(requests=requests)
+
+        # Poll until every request in the batch has been processed
+        while batch.processing_status != "ended":
+            time.sleep(self.batch_poll_interval)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        # Results are not guaranteed to be in submission order
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                i = int(entry.custom_id)
+                reply_content = self._extract_reply(entry.result.message)
+                if self.use_cache:
+                    self._get_cache().set(keys[i], reply_content, expire=self.cache_expire)
+                replies[i] = ChatMessage.from_assistant(reply_content)
+
+        return replies
+
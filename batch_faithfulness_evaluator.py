@@ -0,0 +1,157 @@
+"""Batched Faithfulness Evaluator for Haystack"""
+
+import json
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from diskcache import Cache
+from haystack import component
+from haystack.components.evaluators.faithfulness import FaithfulnessEvaluator
+from haystack.dataclasses import ChatMessage
+
+
+@component
+class BatchFaithfulnessEvaluator(FaithfulnessEvaluator):
+    """
+    A FaithfulnessEvaluator that sends all of its LLM judgments as a single batch.
+
+    The stock evaluator calls the chat generator once per answer. This component buffers every
+    prompt first and drains them through the generator's `run_batch` method, so the chat generator
+    must provide one (e.g. AnthropicChatGenerator).
+
+    Judgments are cached on disk per (question, contexts, predicted answer), judging model and prompt, so
+    repeated evaluations of the same sample only send new answers to the LLM.
+    """
+
+    # Judgment cache shared by every instance, created on first use
+    _cache: Optional[Cache] = None
+    cache_dir = ".faith_cache"
+    # Same lifetime as AnthropicChatGenerator's response cache
+    cache_expire = 86400
+
+    def __init__(self, *args, use_cache: bool = True, **kwargs):
+        """
+        Initialize the Batch Faithfulness Evaluator.
+
+        :param args: Positional arguments for FaithfulnessEvaluator.
+        :param use_cache: If True, judgments are reused from an on-disk cache instead of calling the LLM again.
+        :param kwargs: Keyword arguments for FaithfulnessEvaluator, e.g. `chat_generator`.
+        """
+        # @component rebuilds the class, so the zero-argument super() would not find it in the MRO
+        super(BatchFaithfulnessEvaluator, self).__init__(*args, **kwargs)  # noqa: UP008
+        self.use_cache = use_cache
+
+    @classmethod
+    def _get_cache(cls) -> Cache:
+        """
+        Return the shared on-disk judgment cache, opening it on first use.
+        """
+        if cls._cache is None:
+            cls._cache = Cache(cls.cache_dir)
+        return cls._cache
+
+    def _cache_key(self, input_names_to_values: Dict[str, Any]) -> str:
+        """
+        Hash one evaluation input together with the judging model and prompt template.
+
+        :param input_names_to_values: The question, contexts and predicted answer of one sample.
+        :return: Hex digest identifying the judgment.
+        """
+        payload = json.dumps(
+            {
+                "model": getattr(self._chat_generator, "model", None),
+                # Covers the instructions, examples and output keys, so editing them invalidates old judgments
+                "template": self.prepare_template(),
+                **input_names_to_values,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _parse_result(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a judgment reply, checking that it is a JSON object with every expected output key.
+
+        :param text: Reply text of the chat generator.
+        :return: The parsed judgment, or None if it is invalid and `raise_on_failure` is False.
+        :raises ValueError: If the reply is invalid and `raise_on_failure` is True.
+        """
+        try:
+            result = json.loads(text)
+        except json.JSONDecodeError as e:
+            if self.raise_on_failure:
+                raise ValueError(f"Faithfulness judgment is not valid JSON: {text}") from e
+            return None
+
+        if not isinstance(result, dict) or any(key not in result for key in self.outputs):
+            if self.raise_on_failure:
+                raise ValueError(f"Faithfulness judgment does not contain the expected keys {self.outputs}: {text}")
+            return None
+
+        return result
+
+    @component.output_types(individual_scores=List[float], score=float, results=List[Dict[str, Any]])
+    def run(self, **inputs: Any) -> Dict[str, Any]:
+        """
+        Run the faithfulness evaluation on all inputs in one batch.
+
+        :param inputs: Keyword arguments `questions`, `contexts` and `predicted_answers`, as for FaithfulnessEvaluator.
+        :return: Dictionary with "individual_scores", "score" and "results" keys.
+        """
+        self.validate_input_parameters(dict(self.inputs), inputs)
+
+        input_names, values = inputs.keys(), list(zip(*inputs.values()))
+        list_of_input_names_to_values = [dict(zip(input_names, v)) for v in values]
+        keys = [self._cache_key(input_names_to_values) for input_names_to_values in list_of_input_names_to_values]
+
+        # Reuse cached judgments, and buffer one prompt per remaining (question, contexts, predicted_answer) triple
+        results: List[Optional[Dict[str, Any]]] = [
+            self._get_cache().get(key) if self.use_cache else None for key in keys
+        ]
+        misses = [i for i, result in enumerate(results) if result is None]
+        prompts = [
+            [ChatMessage.from_user(self.builder.run(**list_of_input_names_to_values[i])["prompt"])] for i in misses
+        ]
+
+        replies = self._chat_generator.run_batch(prompts) if prompts else []
+
+        for i, prompt, reply in zip(misses, prompts, replies):
+            if reply is None:
+                # Retry requests that failed inside the batch individually
+                try:
+                    reply = self._chat_generator.run(messages=prompt)["replies"][0]
+                except Exception as e:
+                    if self.raise_on_failure:
+                        raise ValueError(f"Error while generating response for prompt: {prompt}. Error: {e}") from e
+
+            result = self._parse_result(reply.text) if reply is not None else None
+            if result is None:
+                # Same fallback as FaithfulnessEvaluator for failed generations
+                results[i] = {"statements": [], "statement_scores": [], "score": float("nan")}
+                continue
+
+            # Average statement faithfulness score per answer
+            result["score"] = float(np.mean(result["statement_scores"])) if result["statements"] else 0
+            results[i] = result
+
+            if self.use_cache:
+                self._get_cache().set(keys[i], result, expire=self.cache_expire)
+
+        individual_scores = [result["score"] for result in results]
+
+        return {"individual_scores": individual_scores, "score": np.mean(individual_scores), "results": results}
+
+    @component.output_types(individual_scores=List[float], score=float, results=List[Dict[str, Any]])
+    async def run_async(self, **inputs: Any) -> Dict[str, Any]:
+        """
+        Run the faithfulness evaluation on all inputs in one batch, without blocking the event loop.
+
+        Haystack requires `run` and `run_async` to share their signature and output types, so the inherited
+        per-answer `run_async` is replaced by the batched `run`, executed in a worker thread.
+
+        :param inputs: Keyword arguments `questions`, `contexts` and `predicted_answers`, as for FaithfulnessEvaluator.
+        :return: Dictionary with "individual_scores", "score" and "results" keys.
+        """
+        return await asyncio.to_thread(self.run, **inputs)
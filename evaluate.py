@@ -1,48 +1,102 @@
 """Evaluation script for the RAG pipeline"""
 
-import random
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from main import rag_pipeline, all_questions, all_ground_truth_answers, all_documents
+from main import load_pubmedqa, load_query_embedder, build_document_store, build_rag_pipeline
 from haystack import Pipeline
 from haystack.components.evaluators.document_mrr import DocumentMRREvaluator
-from haystack.components.evaluators.faithfulness import FaithfulnessEvaluator
 from haystack.components.evaluators.sas_evaluator import SASEvaluator
 from haystack.evaluation.eval_run_result import EvaluationRunResult
 from anthropic_chat_generator import AnthropicChatGenerator
+from batch_faithfulness_evaluator import BatchFaithfulnessEvaluator
+
+# Send Claude requests through the Message Batches API (cheaper) or concurrently from a thread pool (faster turnaround)
+USE_BATCH_API = True
+
+# Reuse answers for paraphrased questions across runs. Off by default, so the scores always reflect
+# answers generated by the current pipeline (exact repeats are still served from the response cache)
+USE_SEMANTIC_CACHE = False
+
+# Seed used to select the evaluation sample
+SAMPLE_SEED = 42
+
+# Load the dataset, index the documents and build the RAG pipeline
+all_documents, all_questions, all_ground_truth_answers, dataset_fingerprint = load_pubmedqa()
+query_embedder = load_query_embedder()
+embedding_model = query_embedder.embedding_backend.model
+document_store = build_document_store(all_documents, embedding_model, dataset_fingerprint)
+rag_pipeline = build_rag_pipeline(document_store, query_embedder)
 
 # Select 25 random questions and their corresponding ground truth answers and documents
-questions, ground_truth_answers, ground_truth_docs = zip(
-    *random.sample(list(zip(all_questions, all_ground_truth_answers, all_documents)), 25)
-)
+# A fixed seed keeps the sample, and therefore the response caches, stable across runs
+sample_idx = np.random.default_rng(seed=SAMPLE_SEED).choice(len(all_questions), size=25, replace=False)
+questions = [all_questions[i] for i in sample_idx]
+ground_truth_answers = [all_ground_truth_answers[i] for i in sample_idx]
+ground_truth_docs = [all_documents[i] for i in sample_idx]
 
 # Run the RAG pipeline on all questions and collect answers and retrieved documents
 rag_answers = []
 retrieved_docs = []
 
-print("Running RAG pipeline on 25 questions...\n")
-for i, question in enumerate(list(questions), 1):
-    print(f"[{i}/25] Processing question...")
-    response = rag_pipeline.run(
-        {
-            "query_embedder": {"text": question},
-            "prompt_builder": {"question": question},
-            "answer_builder": {"query": question},
-        }
-    )
-    
-    rag_answers.append(response["answer_builder"]["answers"][0].data)
-    retrieved_docs.append(response["answer_builder"]["answers"][0].documents)
-    
-    print(f"Question: {question[:100]}...")
-    print(f"Answer: {rag_answers[-1][:100]}...")
-    print("\n" + "-" * 80 + "\n")
+retriever = rag_pipeline.get_component("retriever")
+prompt_builder = rag_pipeline.get_component("prompt_builder")
+generator = rag_pipeline.get_component("generator")
+generator.chat_generator.use_batch_api = USE_BATCH_API
+generator.use_cache = USE_SEMANTIC_CACHE
+answer_builder = rag_pipeline.get_component("answer_builder")
+rag_pipeline.warm_up()
+
+# Stage 1: embed, retrieve and build prompts locally for every question
+# All questions are embedded in one batch rather than one at a time
+# Without the Batches API, each prompt is handed to a worker thread as soon as it is built,
+# so Claude calls are already in flight while the remaining questions are retrieved
+print("Running retrieval on 25 questions...\n")
+query_embeddings = embedding_model.encode(list(questions), batch_size=32, normalize_embeddings=True, convert_to_numpy=True)
+executor = None if USE_BATCH_API else ThreadPoolExecutor(max_workers=generator.chat_generator.max_workers)
+# Cancel queued requests and release the worker threads even if stage 1 or 2 fails
+try:
+    prompts = []
+    futures = []
+    for i, (question, query_embedding) in enumerate(zip(questions, query_embeddings), 1):
+        print(f"[{i}/25] Retrieving documents...")
+        documents = retriever.run(query_embedding=query_embedding.tolist())["documents"]
+        prompts.append(prompt_builder.run(question=question, documents=documents)["prompt"])
+        retrieved_docs.append(documents)
+        if executor is not None:
+            futures.append(executor.submit(generator.run, messages=prompts[-1]))
+
+    # Stage 2: collect all answers
+    print("\nGenerating answers for 25 questions...\n")
+    if executor is None:
+        replies = generator.run_batch(prompts)
+    else:
+        # Build each answer on the main thread as soon as its reply arrives
+        replies = (future.result()["replies"][0] for future in futures)
+
+    for question, prompt, reply, documents in zip(questions, prompts, replies, retrieved_docs):
+        if reply is None:
+            # Retry requests that failed inside the batch individually
+            reply = generator.run(messages=prompt)["replies"][0]
+        response = answer_builder.run(query=question, replies=[reply], documents=documents)
+        rag_answers.append(response["answers"][0].data)
+
+        print(f"Question: {question[:100]}...")
+        print(f"Answer: {rag_answers[-1][:100]}...")
+        print("\n" + "-" * 80 + "\n")
+finally:
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+    # Persist the semantic cache entries added by individual runs
+    generator.save()
 
 # Build evaluation pipeline
 print("Setting up evaluation pipeline...\n")
 eval_pipeline = Pipeline()
 eval_pipeline.add_component("doc_mrr_evaluator", DocumentMRREvaluator())
 # FaithfulnessEvaluator needs a generator with json_mode=True to return JSON-formatted responses
-eval_pipeline.add_component("faithfulness", FaithfulnessEvaluator(chat_generator=AnthropicChatGenerator(model="claude-sonnet-4-5-20250929", json_mode=True)))
+# The batched variant sends all 25 judgments to Claude at once
+eval_pipeline.add_component("faithfulness", BatchFaithfulnessEvaluator(chat_generator=AnthropicChatGenerator(model="claude-sonnet-4-5-20250929", json_mode=True, use_batch_api=USE_BATCH_API)))
 eval_pipeline.add_component("sas_evaluator", SASEvaluator(model="sentence-transformers/all-MiniLM-L6-v2"))
 
 # Run evaluation
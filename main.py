@@ -1,46 +1,30 @@
 import os
-from typing import List
+import hashlib
+from typing import List, Tuple
 from getpass import getpass
 from dotenv import load_dotenv
 
+import numpy as np
+import torch
 from datasets import load_dataset
 from haystack import Document, Pipeline
-from haystack.components.embedders import SentenceTransformersDocumentEmbedder, SentenceTransformersTextEmbedder
-from haystack.components.writers import DocumentWriter
+from haystack.components.embedders import SentenceTransformersTextEmbedder
 from haystack.components.builders import AnswerBuilder, ChatPromptBuilder
-from haystack.components.retrievers.in_memory import InMemoryEmbeddingRetriever
 from anthropic_chat_generator import AnthropicChatGenerator
+from numpy_embedding_retriever import NumpyEmbeddingRetriever
+from semantic_cache_generator import SemanticCacheGenerator
 from haystack.dataclasses import ChatMessage
 from haystack.document_stores.in_memory import InMemoryDocumentStore
 from haystack.document_stores.types import DuplicatePolicy
+from haystack.utils import ComponentDevice
+from sentence_transformers import SentenceTransformer
 
-dataset = load_dataset("vblagoje/PubMedQA_instruction", split="train")
-dataset = dataset.select(range(1000))
-all_documents = [Document(content=doc["context"]) for doc in dataset]
-all_questions = [doc["instruction"] for doc in dataset]
-all_ground_truth_answers = [doc["response"] for doc in dataset]
-
-document_store = InMemoryDocumentStore()
-
-document_embedder = SentenceTransformersDocumentEmbedder(model="sentence-transformers/all-MiniLM-L6-v2")
-document_writer = DocumentWriter(document_store=document_store, policy=DuplicatePolicy.SKIP)
-
-indexing = Pipeline()
-indexing.add_component(instance=document_embedder, name="document_embedder")
-indexing.add_component(instance=document_writer, name="document_writer")
-
-indexing.connect("document_embedder.documents", "document_writer.documents")
-
-indexing.run({"document_embedder": {"documents": all_documents}})
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Set up Anthropic API key
-if "ANTHROPIC_API_KEY" not in os.environ:
-    os.environ["ANTHROPIC_API_KEY"] = getpass("Enter Anthropic API key: ")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = ".embedding_cache"
 
 # Create RAG pipeline template
+# The question is kept in its own final message so the semantic cache compares questions rather than contexts,
+# and so the context message can be sent to Claude as a cacheable prompt prefix
 template = [
     ChatMessage.from_user(
         """
@@ -49,24 +33,142 @@ template = [
         {% for document in documents %}
             {{ document.content }}
         {% endfor %}
+        """
+    ),
+    ChatMessage.from_user(
+        """
         Question: {{question}}
         Answer:
         """
-    )
+    ),
 ]
 
-# Build RAG pipeline
-rag_pipeline = Pipeline()
-rag_pipeline.add_component(
-    "query_embedder", SentenceTransformersTextEmbedder(model="sentence-transformers/all-MiniLM-L6-v2")
-)
-rag_pipeline.add_component("retriever", InMemoryEmbeddingRetriever(document_store, top_k=3))
-rag_pipeline.add_component("prompt_builder", ChatPromptBuilder(template=template))
-rag_pipeline.add_component("generator", AnthropicChatGenerator(model="claude-sonnet-4-5-20250929"))
-rag_pipeline.add_component("answer_builder", AnswerBuilder())
-
-rag_pipeline.connect("query_embedder", "retriever.query_embedding")
-rag_pipeline.connect("retriever", "prompt_builder.documents")
-rag_pipeline.connect("prompt_builder.prompt", "generator.messages")
-rag_pipeline.connect("generator.replies", "answer_builder.replies")
-rag_pipeline.connect("retriever", "answer_builder.documents")
\ No newline at end of file
+
+def load_pubmedqa(num_samples: int = 1000) -> Tuple[List[Document], List[str], List[str], str]:
+    """
+    Load the first samples of the PubMedQA dataset.
+
+    :param num_samples: Number of samples to load.
+    :return: Tuple of (documents, questions, ground truth answers, dataset fingerprint).
+    """
+    dataset = load_dataset("vblagoje/PubMedQA_instruction", split="train")
+    dataset = dataset.select(range(num_samples))
+    all_documents = [Document(content=doc["context"]) for doc in dataset]
+    all_questions = [doc["instruction"] for doc in dataset]
+    all_ground_truth_answers = [doc["response"] for doc in dataset]
+    return all_documents, all_questions, all_ground_truth_answers, dataset._fingerprint
+
+
+def load_query_embedder() -> SentenceTransformersTextEmbedder:
+    """
+    Create and warm up the query embedder. Its model is also used to embed the documents.
+
+    :return: The warmed-up query embedder.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    query_embedder = SentenceTransformersTextEmbedder(model=EMBEDDING_MODEL, device=ComponentDevice.from_str(device))
+    query_embedder.warm_up()
+    if device == "cuda":
+        # Half precision on GPU
+        query_embedder.embedding_backend.model.half()
+    return query_embedder
+
+
+def build_document_store(
+    all_documents: List[Document], embedding_model: SentenceTransformer, dataset_fingerprint: str
+) -> InMemoryDocumentStore:
+    """
+    Embed the documents and write them to an in-memory document store.
+
+    :param all_documents: Documents to index.
+    :param embedding_model: Model used to embed the documents.
+    :param dataset_fingerprint: Fingerprint of the dataset the documents come from, used to key the embedding cache.
+    :return: Document store containing the embedded documents.
+    """
+    document_store = InMemoryDocumentStore()
+
+    # Only embed each distinct context once; Document IDs are hashes of the content, so repeats share an ID
+    seen_ids = set()
+    unique_documents = []
+    for doc in all_documents:
+        if doc.id not in seen_ids:
+            seen_ids.add(doc.id)
+            unique_documents.append(doc)
+
+    # Reuse document embeddings from earlier runs; the key changes with the model or the dataset selection
+    cache_key = hashlib.sha256(f"{EMBEDDING_MODEL}:{dataset_fingerprint}:{len(unique_documents)}".encode()).hexdigest()
+    embedding_cache_path = os.path.join(EMBEDDING_CACHE_DIR, f"{cache_key}.npy")
+
+    if os.path.exists(embedding_cache_path):
+        embeddings = np.load(embedding_cache_path)
+    else:
+        # Embed all documents in one batched call
+        embeddings = embedding_model.encode(
+            [doc.content for doc in unique_documents],
+            batch_size=256,
+            show_progress_bar=True,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+        np.save(embedding_cache_path, embeddings)
+
+    for doc, embedding in zip(unique_documents, embeddings):
+        doc.embedding = embedding.tolist()
+
+    document_store.write_documents(unique_documents, policy=DuplicatePolicy.SKIP)
+    return document_store
+
+
+def ensure_api_key():
+    """
+    Make sure ANTHROPIC_API_KEY is set, loading it from .env or prompting for it.
+    """
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Set up Anthropic API key
+    if "ANTHROPIC_API_KEY" not in os.environ:
+        os.environ["ANTHROPIC_API_KEY"] = getpass("Enter Anthropic API key: ")
+
+
+def build_rag_pipeline(
+    document_store: InMemoryDocumentStore, query_embedder: SentenceTransformersTextEmbedder
+) -> Pipeline:
+    """
+    Build the RAG pipeline over an indexed document store.
+
+    :param document_store: Document store containing the embedded documents.
+    :param query_embedder: Query embedder, also used by the semantic cache.
+    :return: The RAG pipeline.
+    """
+    ensure_api_key()
+
+    # Build RAG pipeline
+    rag_pipeline = Pipeline()
+    rag_pipeline.add_component("query_embedder", query_embedder)
+    # Search an int8-quantized embedding matrix, a quarter of the size of a float32 one
+    rag_pipeline.add_component("retriever", NumpyEmbeddingRetriever(document_store, top_k=3, precision="int8"))
+    rag_pipeline.add_component("prompt_builder", ChatPromptBuilder(template=template))
+    # Reuse answers for paraphrased questions, embedding prompts with the query embedder's model
+    rag_pipeline.add_component(
+        "generator",
+        SemanticCacheGenerator(AnthropicChatGenerator(model="claude-sonnet-4-5-20250929"), embedder=query_embedder),
+    )
+    rag_pipeline.add_component("answer_builder", AnswerBuilder())
+
+    rag_pipeline.connect("query_embedder", "retriever.query_embedding")
+    rag_pipeline.connect("retriever", "prompt_builder.documents")
+    rag_pipeline.connect("prompt_builder.prompt", "generator.messages")
+    rag_pipeline.connect("generator.replies", "answer_builder.replies")
+    rag_pipeline.connect("retriever", "answer_builder.documents")
+
+    return rag_pipeline
+
+
+if __name__ == "__main__":
+    all_documents, all_questions, all_ground_truth_answers, dataset_fingerprint = load_pubmedqa()
+    query_embedder = load_query_embedder()
+    document_store = build_document_store(all_documents, query_embedder.embedding_backend.model, dataset_fingerprint)
+    rag_pipeline = build_rag_pipeline(document_store, query_embedder)
+    print(f"RAG pipeline ready with {document_store.count_documents()} indexed documents.")
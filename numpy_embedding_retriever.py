@@ -0,0 +1,124 @@
+"""NumPy Embedding Retriever for Haystack"""
+
+from dataclasses import replace
+from typing import List, Optional
+
+import numpy as np
+from haystack import Document, component
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from sentence_transformers import quantize_embeddings
+
+
+@component
+class NumpyEmbeddingRetriever:
+    """
+    An embedding retriever that scores every document with a single matrix-vector product.
+
+    Document embeddings are stacked into one float32 matrix when the retriever is warmed up, so each
+    query is a BLAS dot product over all documents followed by a partial sort for the top results.
+    Documents written to the store after warm-up are not searched.
+
+    With `precision="int8"` the search matrix is scalar-quantized to int8, a quarter of the size of float32.
+    The documents in the store keep their float embeddings.
+    Queries are quantized with the same per-dimension ranges and scored with integer dot products.
+    The int8 codes are offset per dimension, so they only approximate the dot-product ranking.
+    The best `top_k * rescore_multiplier` candidates are therefore rescored with the float query
+    before the top results are taken.
+    """
+
+    def __init__(
+        self,
+        document_store: InMemoryDocumentStore,
+        top_k: int = 10,
+        precision: str = "float32",
+        rescore_multiplier: int = 4,
+    ):
+        """
+        Initialize the NumPy Embedding Retriever.
+
+        :param document_store: Document store holding the embedded documents.
+        :param top_k: Maximum number of documents to return.
+        :param precision: Precision of the embedding matrix, either "float32" or "int8".
+        :param rescore_multiplier: With int8 precision, how many times `top_k` candidates to rescore with the float query.
+        """
+        if precision not in ("float32", "int8"):
+            raise ValueError(f"Unsupported precision '{precision}'. Use 'float32' or 'int8'.")
+
+        self.document_store = document_store
+        self.top_k = top_k
+        self.precision = precision
+        self.rescore_multiplier = rescore_multiplier
+
+        self._documents: Optional[List[Document]] = None
+        self._embeddings: Optional[np.ndarray] = None
+        self._ranges: Optional[np.ndarray] = None
+
+    def warm_up(self):
+        """
+        Stack the embeddings of all documents in the store into one matrix.
+        """
+        if self._embeddings is not None:
+            return
+
+        documents = [doc for doc in self.document_store.filter_documents() if doc.embedding is not None]
+        embeddings = np.asarray([doc.embedding for doc in documents], dtype=np.float32)
+        # The matrix is all that is searched, so don't hold a second copy of the embedding lists
+        self._documents = [replace(doc, embedding=None) for doc in documents]
+
+        if self.precision == "int8" and len(embeddings):
+            # Calibrate the quantization ranges on the documents themselves, and reuse them for queries
+            self._ranges = np.vstack([embeddings.min(axis=0), embeddings.max(axis=0)])
+            embeddings = quantize_embeddings(embeddings, precision="int8", ranges=self._ranges)
+
+        self._embeddings = embeddings
+
+    def _dequantize(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Map int8 codes back to approximate float embeddings, using the centre of each quantization bucket.
+
+        :param codes: int8 embeddings quantized with `self._ranges`.
+        :return: Approximate float32 embeddings.
+        """
+        starts = self._ranges[0]
+        steps = (self._ranges[1] - self._ranges[0]) / 255
+        # Same handling of constant dimensions as quantize_embeddings
+        steps = np.where(steps == 0, 1, steps)
+        return starts + (codes.astype(np.float32) + 128.5) * steps
+
+    @component.output_types(documents=List[Document])
+    def run(self, query_embedding: List[float], top_k: Optional[int] = None):
+        """
+        Retrieve the documents with the highest dot-product similarity to the query.
+
+        :param query_embedding: Embedding of the query.
+        :param top_k: Maximum number of documents to return. Defaults to the value given at initialization.
+        :return: Dictionary with "documents" key containing the retrieved documents, best match first.
+        """
+        self.warm_up()
+
+        top_k = min(top_k or self.top_k, len(self._documents))
+        if top_k == 0:
+            return {"documents": []}
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if self._ranges is None:
+            candidates = np.arange(len(self._documents))
+            scores = self._embeddings @ query
+        else:
+            # Clip to the calibrated ranges first; older sentence-transformers versions don't, and values wrap around
+            clipped = np.clip(query, self._ranges[0], self._ranges[1])
+            query_int8 = quantize_embeddings(clipped[np.newaxis], precision="int8", ranges=self._ranges)[0]
+            # Accumulate in int32 so the int8 products cannot overflow
+            int_scores = np.einsum("ij,j->i", self._embeddings, query_int8, dtype=np.int32)
+
+            # Rescore an oversampled candidate set with the float query to restore the dot-product ranking
+            num_candidates = min(top_k * self.rescore_multiplier, len(self._documents))
+            candidates = np.argpartition(-int_scores, num_candidates - 1)[:num_candidates]
+            scores = self._dequantize(self._embeddings[candidates]) @ query
+
+        # Only the top_k scores need to be ordered
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        documents = [replace(self._documents[candidates[i]], score=float(scores[i])) for i in top]
+        return {"documents": documents}
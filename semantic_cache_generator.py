@@ -0,0 +1,208 @@
+"""Semantic cache wrapper for Haystack chat generators"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from haystack import component
+from haystack.components.embedders import SentenceTransformersTextEmbedder
+from haystack.dataclasses import ChatMessage
+
+from anthropic_chat_generator import AnthropicChatGenerator
+
+
+@component
+class SemanticCacheGenerator:
+    """
+    A chat generator component that reuses earlier replies for semantically similar prompts.
+
+    The final user message of each conversation is embedded and compared against the embeddings of
+    previously answered prompts. If the best cosine similarity reaches the threshold, the stored reply
+    is returned; otherwise the wrapped generator is called and its reply is added to the cache.
+
+    Only prompts with the same model, JSON mode and preceding messages (system prompt, retrieved context)
+    are compared, so a reply is never reused for a different context or after the model changes.
+
+    New entries are kept in memory and written to `cache_path` by `save()`, which `run_batch` calls once per batch.
+    Callers using `run` should call `save()` when they are done.
+    """
+
+    def __init__(
+        self,
+        chat_generator: AnthropicChatGenerator,
+        embedder: SentenceTransformersTextEmbedder,
+        threshold: float = 0.92,
+        cache_path: str = "semantic_cache.npz",
+        use_cache: bool = True,
+    ):
+        """
+        Initialize the Semantic Cache Generator.
+
+        :param chat_generator: The generator to call on cache misses.
+        :param embedder: Text embedder used to embed prompts. Pass the pipeline's query embedder to reuse its model.
+        :param threshold: Minimum cosine similarity for a cached reply to be reused.
+        :param cache_path: Path of the .npz file the cache is persisted to between runs.
+        :param use_cache: If False, every call goes straight to the wrapped generator.
+        """
+        self.chat_generator = chat_generator
+        self.embedder = embedder
+        self.threshold = threshold
+        self.cache_path = cache_path
+        self.use_cache = use_cache
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._embeddings: Optional[np.ndarray] = None
+        self._replies: List[str] = []
+        self._keys: Optional[np.ndarray] = None
+        self._unsaved = False
+
+        # Load replies cached by previous runs; files from before cache keys were stored are ignored
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                if "keys" in data.files:
+                    self._embeddings = data["embeddings"]
+                    self._replies = data["replies"].tolist()
+                    self._keys = data["keys"]
+
+    def warm_up(self):
+        """
+        Load the embedding model.
+        """
+        self.embedder.warm_up()
+
+    def _cache_entry(self, messages: List[ChatMessage]) -> Optional[Tuple[np.ndarray, str]]:
+        """
+        Embed the final user message of a conversation and hash everything else its reply depends on.
+
+        :param messages: List of ChatMessage objects representing the conversation.
+        :return: Tuple of (normalized embedding of the final user message, key of the cache partition),
+            or None if the conversation has no user message or contains non-text messages.
+        """
+        user_indices = [i for i, msg in enumerate(messages) if msg.is_from("user")]
+        # Only plain text conversations can be compared; anything else bypasses the cache
+        if not user_indices or any(msg.text is None for msg in messages):
+            return None
+        final_index = user_indices[-1]
+
+        # The model, JSON mode and all other messages must match exactly for a reply to be reused
+        payload = json.dumps(
+            {
+                "model": self.chat_generator.model,
+                "json_mode": self.chat_generator.json_mode,
+                "messages": [(msg.role.value, msg.text) for i, msg in enumerate(messages) if i != final_index],
+            }
+        )
+        key = hashlib.sha256(payload.encode()).hexdigest()
+
+        embedding = np.asarray(self.embedder.run(text=messages[final_index].text)["embedding"], dtype=np.float32)
+        return embedding / np.linalg.norm(embedding), key
+
+    def _lookup(self, embedding: np.ndarray, key: str) -> Optional[ChatMessage]:
+        """
+        Find a cached reply in the same partition whose prompt is similar enough to the given embedding.
+
+        :param embedding: Normalized prompt embedding.
+        :param key: Key of the cache partition.
+        :return: The cached reply, or None on a cache miss.
+        """
+        with self._lock:
+            if self._embeddings is None:
+                return None
+            candidates = np.flatnonzero(self._keys == key)
+            if not len(candidates):
+                return None
+            scores = self._embeddings[candidates] @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return ChatMessage.from_assistant(self._replies[candidates[best]])
+        return None
+
+    def _store(self, entries: List[Tuple[np.ndarray, str]], replies: List[ChatMessage]):
+        """
+        Add new prompt embeddings and their replies to the in-memory cache.
+
+        :param entries: Normalized prompt embeddings with their cache partition keys.
+        :param replies: Replies generated for those prompts.
+        """
+        if not replies:
+            return
+
+        with self._lock:
+            new_embeddings = np.vstack([embedding for embedding, _ in entries])
+            new_keys = np.array([key for _, key in entries])
+            if self._embeddings is None:
+                self._embeddings = new_embeddings
+                self._keys = new_keys
+            else:
+                self._embeddings = np.vstack([self._embeddings, new_embeddings])
+                self._keys = np.concatenate([self._keys, new_keys])
+            self._replies.extend(reply.text for reply in replies)
+            self._unsaved = True
+
+    def save(self):
+        """
+        Persist the cache to `cache_path` if entries were added since it was last saved.
+        """
+        # Snapshot under the lookup lock but write outside it, so lookups aren't blocked on disk I/O.
+        # The save lock keeps concurrent saves from overwriting a newer snapshot with an older one
+        with self._save_lock:
+            with self._lock:
+                if not self._unsaved:
+                    return
+                embeddings, replies, keys = self._embeddings, list(self._replies), self._keys
+                self._unsaved = False
+            np.savez(self.cache_path, embeddings=embeddings, replies=np.array(replies), keys=keys)
+
+    @component.output_types(replies=List[ChatMessage])
+    def run(self, messages: List[ChatMessage]):
+        """
+        Generate a reply, reusing a cached one for semantically similar prompts.
+
+        :param messages: List of ChatMessage objects representing the conversation.
+        :return: Dictionary with "replies" key containing a list of ChatMessage objects.
+        """
+        if not self.use_cache:
+            return self.chat_generator.run(messages=messages)
+
+        entry = self._cache_entry(messages)
+        if entry is None:
+            return self.chat_generator.run(messages=messages)
+
+        cached_reply = self._lookup(*entry)
+        if cached_reply is not None:
+            return {"replies": [cached_reply]}
+
+        result = self.chat_generator.run(messages=messages)
+        self._store([entry], result["replies"][:1])
+
+        return result
+
+    def run_batch(self, messages_list: List[List[ChatMessage]]) -> List[Optional[ChatMessage]]:
+        """
+        Generate replies for many conversations, sending only the cache misses to the wrapped generator.
+
+        :param messages_list: List of conversations, each a list of ChatMessage objects.
+        :return: List of reply ChatMessages in the same order as `messages_list`.
+            Entries are None where the wrapped generator failed to produce a reply.
+        """
+        if not self.use_cache:
+            return self.chat_generator.run_batch(messages_list)
+
+        entries = [self._cache_entry(messages) for messages in messages_list]
+        replies = [self._lookup(*entry) if entry is not None else None for entry in entries]
+
+        misses = [i for i, reply in enumerate(replies) if reply is None]
+        if misses:
+            generated = self.chat_generator.run_batch([messages_list[i] for i in misses])
+            for i, reply in zip(misses, generated):
+                replies[i] = reply
+
+            succeeded = [i for i in misses if replies[i] is not None and entries[i] is not None]
+            self._store([entries[i] for i in succeeded], [replies[i] for i in succeeded])
+            self.save()
+
+        return replies